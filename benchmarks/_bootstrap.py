@@ -0,0 +1,29 @@
+# benchmarks/_bootstrap.py
+#
+# Configura Django contra una base SQLite temporal para que los benchmarks
+# nunca toquen db.sqlite3.
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django() -> str:
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'viamatica_project.settings')
+    # Sin trazas de LangSmith: mediríamos la red, no el checkout.
+    os.environ['LANGSMITH_TRACING_V2'] = 'false'
+
+    import django
+    from django.conf import settings
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='viamatica-bench-'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = db_path
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return db_path
@@ -0,0 +1,76 @@
+# benchmarks/cart_render.py
+#
+# Tiempo y consultas de GET /carrito/ con 100 items, pasando por la vista real
+# (middlewares de sesión y autenticación, carrito, items y sugerencias).
+#
+#   python benchmarks/cart_render.py --items 100 --iterations 200
+
+import argparse
+import statistics
+import sys
+import time
+
+from _bootstrap import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+    from core.models import Cart, CartItem, Category, Product, RelatedProduct
+
+    categories = Category.objects.bulk_create(Category(name=f'Categoría {i}') for i in range(10))
+    products = Product.objects.bulk_create(
+        Product(name=f'Producto {i}', price='19.99', category=categories[i % 10], stock=100)
+        for i in range(args.items)
+    )
+    user = User.objects.create(username='bench')
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=2) for product in products)
+    suggested = Product.objects.bulk_create(
+        Product(name=f'Sugerido {i}', price='9.99', category=categories[i], stock=100) for i in range(10)
+    )
+    RelatedProduct.objects.bulk_create(
+        RelatedProduct(product=product, related=suggested[i % 10], rank=1, score=1)
+        for i, product in enumerate(products)
+    )
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    client = Client()
+    client.force_login(user)
+    url = reverse('cart')
+
+    def render():
+        response = client.get(url)
+        assert response.status_code == 200
+        return response
+
+    render()  # calienta la caché de plantillas
+    # execute_wrapper y no CaptureQueriesContext: request_started vacía connection.queries.
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *rest: queries.append(sql) or execute(sql, *rest)):
+        render()
+
+    timings = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    print(f"items={args.items} iteraciones={args.iterations} consultas_por_peticion={len(queries)}")
+    print(f"mediana={statistics.median(timings):.2f}ms p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# benchmarks/checkout_contention.py
+#
+# Prueba de estrés del checkout: muchos hilos compran a la vez el mismo
+# producto "caliente" con stock limitado. Verifica que no se sobrevende y
+# mide checkouts/segundo bajo contención.
+#
+#   python benchmarks/checkout_contention.py --stock 50 --buyers 200 --threads 16
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _bootstrap import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stock', type=int, default=50)
+    parser.add_argument('--buyers', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from core.models import Cart, CartItem, Category, Invoice, Product
+    from core.services.checkout_agent import run_checkout_agent
+
+    category = Category.objects.create(name='Bench')
+    product = Product.objects.create(name='Producto caliente', price='9.99', category=category, stock=args.stock)
+    users = User.objects.bulk_create(User(username=f'buyer{i}') for i in range(args.buyers))
+    carts = Cart.objects.bulk_create(Cart(user=user) for user in users)
+    # Los carritos se crean sin reserva (como si hubiera expirado) para que la
+    # única barrera contra la sobreventa sea el UPDATE condicional.
+    CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=1) for cart in carts)
+
+    def checkout(cart):
+        try:
+            return not run_checkout_agent(user_id=cart.user_id, cart_id=cart.id).get('error')
+        finally:
+            connection.close()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(checkout, carts))
+        elapsed = time.perf_counter() - start
+
+    product.refresh_from_db()
+    sold = sum(results)
+    invoices = Invoice.objects.count()
+    print(f"compradores={args.buyers} hilos={args.threads} stock_inicial={args.stock}")
+    print(f"vendidos={sold} rechazados={args.buyers - sold} facturas={invoices} stock_final={product.stock}")
+    print(f"{args.buyers / elapsed:.1f} checkouts/s ({elapsed:.2f}s en total)")
+
+    expected = min(args.stock, args.buyers)
+    if sold != expected or invoices != sold or product.stock != args.stock - sold:
+        print("ERROR: el inventario quedó inconsistente", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
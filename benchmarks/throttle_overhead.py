@@ -0,0 +1,88 @@
+# benchmarks/throttle_overhead.py
+#
+# Costo de TokenBucketThrottle.allow_request por petición, aceptando y
+# rechazando, y número de consultas a la base de datos que dispara (debe ser 0).
+# Con --threads varios hilos reparten las llamadas (camino rápido sin lock) y
+# con --max-buckets menor que --clients se mide también el desalojo.
+#
+#   python benchmarks/throttle_overhead.py --iterations 200000 --threads 8
+
+import argparse
+import sys
+import threading
+import time
+
+from _bootstrap import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=200_000)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--max-buckets', type=int, default=None)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from core.throttling import TokenBucketThrottle
+
+    if args.max_buckets:
+        TokenBucketThrottle.max_buckets = args.max_buckets
+    settings.THROTTLE_BUCKETS = {
+        'open': {'burst': 10 ** 9, 'rate': '1000000/s'},
+        'closed': {'burst': 1, 'rate': '1/d'},
+    }
+
+    class View:
+        throttle_scope = None
+
+    factory = APIRequestFactory()
+    requests = []
+    for i in range(args.clients):
+        request = Request(factory.post('/api/checkout/', REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}'))
+        if i % 2:
+            request.user = User(pk=i, username=f'user{i}')
+        else:
+            request._not_authenticated()
+        requests.append(request)
+
+    def run(scope):
+        view = View()
+        view.throttle_scope = scope
+        throttle = TokenBucketThrottle()
+        for request in requests:  # crea los buckets antes de medir
+            throttle.allow_request(request, view)
+        per_thread = args.iterations // args.threads
+
+        def worker(offset):
+            for i in range(offset, offset + per_thread):
+                throttle.allow_request(requests[i % args.clients], view)
+
+        threads = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(args.threads)]
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        return elapsed / (per_thread * args.threads) * 1_000_000, len(queries)
+
+    for scope, label in (('open', 'aceptando'), ('closed', 'rechazando')):
+        micros, queries = run(scope)
+        print(
+            f"{label}: {micros:.2f} µs por llamada, {queries} consultas "
+            f"({args.clients} clientes, {args.threads} hilos, {len(TokenBucketThrottle.buckets)} buckets)"
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
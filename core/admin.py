@@ -1,10 +1,223 @@
-from django.contrib import admin
-from .models import Category, Product, Cart, CartItem, Invoice
+import string
+from decimal import Decimal
 
-# Register your models here.
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.functions import Lower, Round
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-admin.site.register(Category)
-admin.site.register(Product)
-admin.site.register(Cart)
-admin.site.register(CartItem)
-admin.site.register(Invoice)
\ No newline at end of file
+from .models import Category, Product, Cart, CartItem, Invoice, InvoiceItem, StockReservation
+
+# Filas por bloque en las acciones masivas: cada bloque es una transacción corta.
+ADMIN_CHUNK_SIZE = 1000
+
+
+# --- Utilidades para tablas grandes ---
+
+def _estimated_row_count(model, using):
+    """
+    Estimación barata del total de filas de la tabla, o None si el motor no la
+    ofrece. En SQLite es MAX(rowid): no baja al borrar filas, así que después de
+    una purga sobreestima y el changelist muestra páginas finales vacías.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        elif connection.vendor == 'sqlite':
+            # MAX(rowid) se resuelve con el índice de la clave primaria.
+            cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Evita el COUNT(*) completo del changelist. Primero cuenta como máximo
+    `max_exact_count + 1` filas (costo acotado): si no llega al tope, el total es
+    exacto. Solo en tablas más grandes y sin filtros usa la estimación del motor,
+    que nunca baja del conteo acotado; con filtros el total queda en el tope.
+    """
+    max_exact_count = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        bounded = queryset[:self.max_exact_count + 1].count()
+        if bounded <= self.max_exact_count or queryset.query.where:
+            return bounded
+        estimate = _estimated_row_count(queryset.model, queryset.db)
+        return max(bounded, estimate or 0)
+
+
+def _prefix_range(term):
+    """Rango [term, term + U+10FFFF): equivale a "empieza por" y lo resuelve un índice B-tree."""
+    return term, term + '\U0010ffff'
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _lower_like_db(term, using):
+    """
+    Pasa el término a minúsculas igual que LOWER() del motor, para que el rango
+    coincida con el índice. LOWER() de SQLite solo convierte A-Z ('Ácido' queda
+    igual), así que allí las iniciales acentuadas distinguen mayúsculas.
+    """
+    if connections[using].vendor == 'sqlite':
+        return term.translate(_ASCII_LOWER)
+    return term.lower()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Sin el segundo COUNT(*) que muestra "N de M seleccionados".
+    show_full_result_count = False
+    list_per_page = 50
+    # La búsqueda por defecto del admin (LIKE '%...%' o istartswith) recorre la
+    # tabla entera. Aquí solo se busca de formas que usan un índice:
+    # - search_prefix_field: prefijo sin distinguir mayúsculas sobre LOWER(campo),
+    #   que necesita un índice funcional Lower(campo) en la tabla del campo.
+    # - search_exact_field: igualdad exacta sobre un campo indexado.
+    search_prefix_field = None
+    search_exact_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if self.search_prefix_field:
+            low, high = _prefix_range(_lower_like_db(term, queryset.db))
+            queryset = queryset.alias(search_key=Lower(self.search_prefix_field)).filter(
+                search_key__gte=low, search_key__lt=high,
+            )
+        elif self.search_exact_field:
+            queryset = queryset.filter(**{self.search_exact_field: term})
+        return queryset, False
+
+
+def _pk_chunks(queryset, chunk_size=None):
+    """Recorre las claves primarias del queryset por bloques (keyset, sin OFFSET)."""
+    chunk_size = chunk_size or ADMIN_CHUNK_SIZE
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last_pk = None
+    while True:
+        chunk = list((pks if last_pk is None else pks.filter(pk__gt=last_pk))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]
+
+
+# --- Catálogo ---
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ['name', 'updated_at']
+    search_fields = ['name']
+
+
+def _price_action(percent):
+    factor = Decimal(100 + percent) / 100
+
+    @admin.action(description=f"{'Subir' if percent > 0 else 'Bajar'} precio {abs(percent)}%%")
+    def change_price(modeladmin, request, queryset):
+        updated = 0
+        for chunk in _pk_chunks(queryset):
+            with transaction.atomic():
+                updated += Product.objects.filter(pk__in=chunk).update(
+                    price=Round(F('price') * factor, 2),
+                    updated_at=timezone.now(),
+                )
+        modeladmin.message_user(request, f"Precio actualizado en {updated} productos.", messages.SUCCESS)
+
+    change_price.__name__ = f"change_price_{'up' if percent > 0 else 'down'}_{abs(percent)}"
+    return change_price
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ['name', 'category', 'price', 'stock', 'updated_at']
+    list_select_related = ['category']
+    list_filter = ['category']
+    search_fields = ['name']
+    search_prefix_field = 'name'
+    search_help_text = "Nombre del producto que empieza por el texto (sin distinguir mayúsculas)."
+    autocomplete_fields = ['category']
+    actions = [_price_action(10), _price_action(-10), _price_action(5), _price_action(-5)]
+
+
+# --- Carritos y compras ---
+
+@admin.register(Cart)
+class CartAdmin(LargeTableAdmin):
+    list_display = ['id', 'user', 'ordered', 'created_at', 'updated_at']
+    list_select_related = ['user']
+    list_filter = ['ordered']
+    search_fields = ['user__username']
+    search_exact_field = 'user__username'
+    search_help_text = "Nombre de usuario exacto."
+    raw_id_fields = ['user']
+    actions = ['purge_abandoned_carts']
+
+    @admin.action(description="Eliminar carritos sin comprar seleccionados")
+    def purge_abandoned_carts(self, request, queryset):
+        deleted = 0
+        for chunk in _pk_chunks(queryset.filter(ordered=False)):
+            with transaction.atomic():
+                Cart.objects.filter(pk__in=chunk).delete()
+            deleted += len(chunk)
+        self.message_user(request, f"Se eliminaron {deleted} carritos sin comprar.", messages.SUCCESS)
+
+
+@admin.register(CartItem)
+class CartItemAdmin(LargeTableAdmin):
+    list_display = ['id', 'product', 'cart', 'quantity']
+    # __str__ de CartItem y Cart usa product.name y cart.user.username.
+    list_select_related = ['product', 'cart__user']
+    search_fields = ['product__name']
+    search_prefix_field = 'product__name'
+    search_help_text = "Nombre del producto que empieza por el texto (sin distinguir mayúsculas)."
+    raw_id_fields = ['cart', 'product']
+
+
+class InvoiceItemInline(admin.TabularInline):
+    model = InvoiceItem
+    extra = 0
+    raw_id_fields = ['product', 'category']
+
+
+@admin.register(Invoice)
+class InvoiceAdmin(LargeTableAdmin):
+    list_display = ['id', 'user', 'total_amount', 'created_at']
+    list_select_related = ['user']
+    list_filter = ['created_at']
+    search_fields = ['user__username']
+    search_exact_field = 'user__username'
+    search_help_text = "Nombre de usuario exacto."
+    raw_id_fields = ['user']
+    inlines = [InvoiceItemInline]
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(LargeTableAdmin):
+    list_display = ['id', 'product', 'cart', 'quantity', 'expires_at']
+    list_select_related = ['product', 'cart__user']
+    raw_id_fields = ['cart', 'product']
+    actions = ['purge_expired']
+
+    @admin.action(description="Eliminar reservas vencidas seleccionadas")
+    def purge_expired(self, request, queryset):
+        deleted = 0
+        for chunk in _pk_chunks(queryset.filter(expires_at__lte=timezone.now())):
+            with transaction.atomic():
+                deleted += StockReservation.objects.filter(pk__in=chunk).delete()[0]
+        self.message_user(request, f"Se eliminaron {deleted} reservas vencidas.", messages.SUCCESS)
@@ -0,0 +1,111 @@
+# core/conditional.py
+#
+# Funciones para `django.views.decorators.http.condition`: calculan ETag y
+# Last-Modified con un agregado (COUNT + MAX(updated_at)) sin serializar el
+# cuerpo. El COUNT detecta borrados, que no mueven MAX(updated_at); por eso las
+# listas y el carrito solo emiten ETag: un Last-Modified basado en
+# MAX(updated_at) daría 304 con una lista vieja después de un borrado. El
+# detalle sí lo emite, porque si la fila se borra la vista responde 404.
+# El resultado del detalle se guarda en el request porque `condition` llama
+# por separado a la función del ETag y a la de Last-Modified.
+
+from django.db.models import Count, Max
+
+from .models import Cart, Category, Product
+
+
+def _memoize(request, key, compute):
+    cache = request.__dict__.setdefault('_conditional_state', {})
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def _stamp(value):
+    return f"{value.timestamp():.6f}" if value else "0"
+
+
+def _newest(*values):
+    values = [value for value in values if value]
+    return max(values) if values else None
+
+
+def _categories_etag():
+    state = Category.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+    return f"c{state['count']}-{_stamp(state['updated'])}"
+
+
+def _category_state(pk):
+    try:
+        updated = Category.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    except (ValueError, TypeError):
+        # pk inválido ('abc'): sin validadores, la vista responde 404 como siempre.
+        return None, None
+    if updated is None:
+        return None, None
+    return f"c{pk}-{_stamp(updated)}", updated
+
+
+def _products_etag():
+    products = Product.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+    # El nombre de la categoría forma parte del cuerpo de cada producto.
+    return f"p{products['count']}-{_stamp(products['updated'])}-{_categories_etag()}"
+
+
+def _product_state(pk):
+    try:
+        row = Product.objects.filter(pk=pk).values_list('updated_at', 'category__updated_at').first()
+    except (ValueError, TypeError):
+        return None, None
+    if row is None:
+        return None, None
+    return f"p{pk}-{_stamp(row[0])}-{_stamp(row[1])}", _newest(*row)
+
+
+def _cart_etag(user):
+    cart = (
+        Cart.objects
+        .filter(user=user, ordered=False)
+        .annotate(
+            items_count=Count('items'),
+            products_updated=Max('items__product__updated_at'),
+            # El cuerpo del carrito incluye el nombre de la categoría de cada producto.
+            categories_updated=Max('items__product__category__updated_at'),
+        )
+        .values('pk', 'updated_at', 'items_count', 'products_updated', 'categories_updated')
+        .first()
+    )
+    if cart is None:
+        return None
+    return (
+        f"cart{cart['pk']}-{cart['items_count']}-{_stamp(cart['updated_at'])}"
+        f"-{_stamp(cart['products_updated'])}-{_stamp(cart['categories_updated'])}"
+    )
+
+
+def category_list_etag(request, *args, **kwargs):
+    return _categories_etag()
+
+
+def category_detail_etag(request, pk, *args, **kwargs):
+    return _memoize(request, 'category', lambda: _category_state(pk))[0]
+
+
+def category_detail_last_modified(request, pk, *args, **kwargs):
+    return _memoize(request, 'category', lambda: _category_state(pk))[1]
+
+
+def product_list_etag(request, *args, **kwargs):
+    return _products_etag()
+
+
+def product_detail_etag(request, pk, *args, **kwargs):
+    return _memoize(request, 'product', lambda: _product_state(pk))[0]
+
+
+def product_detail_last_modified(request, pk, *args, **kwargs):
+    return _memoize(request, 'product', lambda: _product_state(pk))[1]
+
+
+def cart_etag(request, *args, **kwargs):
+    return _cart_etag(request.user)
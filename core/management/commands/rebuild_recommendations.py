@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.services.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero la matriz de co-ocurrencia y el top-K de productos comprados juntos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=100_000,
+            help="Líneas de pedido leídas por bloque (por defecto 100000).",
+        )
+
+    def handle(self, *args, **options):
+        result = rebuild_recommendations(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomendaciones recalculadas: {result['order_lines']} líneas de pedido, "
+            f"{result['products']} productos, {result['pairs']} pares."
+        ))
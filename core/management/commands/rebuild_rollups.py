@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.services.reports import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero las tablas de agregados de ventas a partir de las facturas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help="Facturas procesadas por bloque (por defecto 5000).",
+        )
+
+    def handle(self, *args, **options):
+        result = rebuild_rollups(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Agregados recalculados: {result['days']} días, "
+            f"{result['product_rows']} filas por producto, {result['category_rows']} filas por categoría."
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Stock inicial de los productos que ya existían antes de tener inventario:
+# sin esto todo el catálogo quedaría sin unidades y no se podría vender.
+# Ajústalo luego desde el admin con las existencias reales.
+INITIAL_STOCK = 100
+
+
+def backfill_stock(apps, schema_editor):
+    Product = apps.get_model('core', 'Product')
+    Product.objects.update(stock=INITIAL_STOCK)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_stock, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.cart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'expires_at'], name='core_stockr_product_c8a5d6_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cart', 'product'), name='unique_reservation_per_cart_product')],
+            },
+        ),
+    ]
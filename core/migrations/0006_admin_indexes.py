@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:53
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_product_recommendations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cart',
+            name='ordered',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='core_product_name_lower_idx'),
+        ),
+    ]
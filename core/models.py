@@ -2,12 +2,16 @@
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.functions import Lower
+from django.utils import timezone
 
 # --- Modelos del Catálogo ---
 
 class Category(models.Model):
     """Modelo para las categorías de productos."""
     name = models.CharField(max_length=100, unique=True)
+    # Sirve para ETag/Last-Modified de las vistas del catálogo.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name_plural = "Categories" 
@@ -22,6 +26,18 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     category = models.ForeignKey(Category, related_name='products', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    # Unidades físicas disponibles. Solo se descuenta en el checkout mediante
+    # un UPDATE condicional (ver core/services/inventory.py).
+    stock = models.PositiveIntegerField(default=0)
+    # Los UPDATE masivos (p. ej. el descuento de stock) deben fijarlo a mano:
+    # auto_now solo se aplica en save().
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Búsqueda por prefijo sin distinguir mayúsculas en el admin (ver core/admin.py).
+            models.Index(Lower('name'), name='core_product_name_lower_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -30,8 +46,10 @@ class Product(models.Model):
 
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    ordered = models.BooleanField(default=False)
+    ordered = models.BooleanField(default=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Se renueva también al guardar o borrar sus items (ver CartItem).
+    updated_at = models.DateTimeField(auto_now=True)
 
     def get_total(self):
         total = 0
@@ -47,6 +65,15 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Cart.objects.filter(pk=self.cart_id).update(updated_at=timezone.now())
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Cart.objects.filter(pk=self.cart_id).update(updated_at=timezone.now())
+        return result
+
     def get_subtotal(self):
         return self.product.price * self.quantity
 
@@ -56,7 +83,121 @@ class CartItem(models.Model):
 class Invoice(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
         return f"Factura #{self.id} para {self.user.username}"
+
+class InvoiceItem(models.Model):
+    """Línea facturada. Guarda precio y categoría del momento de la venta."""
+    invoice = models.ForeignKey(Invoice, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def get_subtotal(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} en factura #{self.invoice_id}"
+
+class StockReservation(models.Model):
+    """Reserva temporal de unidades para un item de un carrito activo."""
+    cart = models.ForeignKey(Cart, related_name='reservations', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_reservation_per_cart_product'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} reservados para el carrito #{self.cart_id}"
+
+# --- Modelos de Reportes (tablas de agregados) ---
+# Se actualizan dentro de la transacción del checkout y se pueden recalcular
+# desde cero con `python manage.py rebuild_rollups`.
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+
+    def __str__(self):
+        return f"Ventas del {self.date}"
+
+class ProductDailySales(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Product daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_product_daily_sales'),
+        ]
+
+    def __str__(self):
+        return f"Ventas del producto #{self.product_id} el {self.date}"
+
+class CategoryDailySales(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Category daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='unique_category_daily_sales'),
+        ]
+
+    def __str__(self):
+        return f"Ventas de la categoría #{self.category_id} el {self.date}"
+
+# --- Modelos de Recomendaciones ("comprados juntos") ---
+# Se alimentan de los carritos comprados (ver core/services/recommendations.py).
+
+class ProductCoOccurrence(models.Model):
+    """Número de pedidos en los que `product` y `other` se compraron juntos."""
+    product = models.ForeignKey(Product, related_name='co_occurrences', on_delete=models.CASCADE)
+    other = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_product_co_occurrence'),
+        ]
+        indexes = [
+            models.Index(fields=['product', '-count']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id}: {self.count}"
+
+class RelatedProduct(models.Model):
+    """Top-K precalculado de productos comprados junto a `product`."""
+    product = models.ForeignKey(Product, related_name='related_products', on_delete=models.CASCADE)
+    related = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_related_product_rank'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} de {self.product_id}: {self.related_id}"
@@ -2,7 +2,7 @@
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Product, Category, Cart, CartItem
+from .models import Product, Category, Cart, CartItem, DailySales
 
 # --- Serializer para Registro de Usuario ---
 class UserSerializer(serializers.ModelSerializer):
@@ -28,7 +28,7 @@ class CategorySerializer(serializers.ModelSerializer):
     """Serializer para el modelo Category."""
     class Meta:
         model = Category
-        fields = '__all__'
+        fields = ['id', 'name']
 
 class ProductSerializer(serializers.ModelSerializer):
     """Serializer para el modelo Product."""
@@ -37,7 +37,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'category']
+        fields = ['id', 'name', 'description', 'price', 'category', 'stock']
 
 # --- Serializers para el Carrito de Compras ---
 class CartItemSerializer(serializers.ModelSerializer):
@@ -60,4 +60,25 @@ class CartSerializer(serializers.ModelSerializer):
     # --- ESTA ES LA PARTE QUE FALTA O ESTÁ INCORRECTA ---
     class Meta:
         model = Cart
-        fields = ['id', 'user', 'ordered', 'created_at', 'items', 'total']
\ No newline at end of file
+        fields = ['id', 'user', 'ordered', 'created_at', 'items', 'total']
+
+# --- Serializers para Reportes de Ventas ---
+class DailySalesSerializer(serializers.ModelSerializer):
+    """Fila del reporte agrupado por día."""
+    class Meta:
+        model = DailySales
+        fields = ['date', 'revenue', 'units', 'orders']
+
+class ProductSalesSerializer(serializers.Serializer):
+    """Fila del reporte agrupado por producto."""
+    product_id = serializers.IntegerField()
+    name = serializers.CharField()
+    revenue = serializers.DecimalField(source='total_revenue', max_digits=14, decimal_places=2)
+    units = serializers.IntegerField(source='total_units')
+
+class CategorySalesSerializer(serializers.Serializer):
+    """Fila del reporte agrupado por categoría."""
+    category_id = serializers.IntegerField()
+    name = serializers.CharField()
+    revenue = serializers.DecimalField(source='total_revenue', max_digits=14, decimal_places=2)
+    units = serializers.IntegerField(source='total_units')
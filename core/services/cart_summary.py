@@ -0,0 +1,50 @@
+# core/services/cart_summary.py
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+
+@dataclass(frozen=True)
+class CartLine:
+    """Fila del carrito lista para la plantilla: no dispara consultas al renderizar."""
+    id: int
+    product_id: int
+    name: str
+    category_name: str
+    image_url: str | None
+    price: Decimal
+    quantity: int
+    subtotal: Decimal
+
+
+@dataclass(frozen=True)
+class CartSummary:
+    """Vista inmutable del carrito con subtotales y total calculados una sola vez."""
+    id: int
+    lines: tuple[CartLine, ...]
+    total: Decimal
+
+    @property
+    def product_ids(self):
+        return [line.product_id for line in self.lines]
+
+
+def build_cart_summary(cart) -> CartSummary:
+    """Arma el CartSummary con una única consulta a los items (con producto y categoría)."""
+    lines = []
+    total = Decimal('0')
+    for item in cart.items.select_related('product__category').order_by('pk'):
+        product = item.product
+        subtotal = product.price * item.quantity
+        total += subtotal
+        lines.append(CartLine(
+            id=item.id,
+            product_id=product.id,
+            name=product.name,
+            category_name=product.category.name,
+            image_url=product.image.url if product.image else None,
+            price=product.price,
+            quantity=item.quantity,
+            subtotal=subtotal,
+        ))
+    return CartSummary(id=cart.id, lines=tuple(lines), total=total)
@@ -2,10 +2,14 @@ import os
 from dotenv import load_dotenv
 from typing import TypedDict, Annotated, Sequence
 import operator
+from django.db import transaction
 from langgraph.graph import StateGraph, END
 
 # Importar modelos de Django
-from core.models import Cart, Invoice, User
+from core.models import Cart, Invoice, InvoiceItem, Product, User
+from core.services.inventory import InsufficientStock, commit_stock, get_cart_lines, restore_stock
+from core.services.recommendations import record_order
+from core.services.reports import record_sale
 
 # Cargar variables de entorno
 load_dotenv()
@@ -18,6 +22,7 @@ class AgentState(TypedDict):
     cart_id: int
     cart_total: float
     payment_successful: bool
+    stock_lines: dict[int, int] # {product_id: cantidad} descontado del inventario
     invoice_id: int | None # Puede ser un entero o None al inicio
     error: bool
     message: str
@@ -42,14 +47,54 @@ def get_cart_details(state: AgentState) -> AgentState:
         state['message'] = "No se encontró un carrito activo para este usuario."
         return state
 
+def _reopen_cart(state: AgentState) -> None:
+    """
+    Compensación de process_payment: vuelve a abrir el carrito reclamado. Si el
+    usuario ya abrió otro mientras tanto, se deja cerrado para no tener dos
+    carritos abiertos (las vistas asumen uno solo).
+    """
+    with transaction.atomic():
+        if not Cart.objects.filter(user_id=state['user_id'], ordered=False).exists():
+            Cart.objects.filter(pk=state['cart_id']).update(ordered=False)
+
+
 def process_payment(state: AgentState) -> AgentState:
+    # Se reclama el carrito (ordered=False -> True) en la misma transacción que
+    # descuenta el stock: un doble envío encuentra 0 filas y no toca el
+    # inventario. Desde aquí las vistas ya no modifican el carrito, así que las
+    # líneas leídas son exactamente las que se descuentan y se facturan.
+    try:
+        with transaction.atomic():
+            claimed = Cart.objects.filter(
+                pk=state['cart_id'], user_id=state['user_id'], ordered=False,
+            ).update(ordered=True)
+            if not claimed:
+                state['payment_successful'] = False
+                state['error'] = True
+                state['message'] = "Este carrito ya fue procesado."
+                return state
+            lines = get_cart_lines(state['cart_id'])
+            commit_stock(state['cart_id'], lines)
+    except InsufficientStock as e:
+        state['payment_successful'] = False
+        state['error'] = True
+        state['message'] = str(e)
+        return state
+    state['stock_lines'] = lines
+    prices = dict(Product.objects.filter(pk__in=lines.keys()).values_list('pk', 'price'))
+    state['cart_total'] = float(sum(prices[product_id] * quantity for product_id, quantity in lines.items()))
     print(f"--- 💳 Procesando pago por ${state['cart_total']} ---")
+
     # Simulación de un proceso de pago. En un caso real, aquí iría la
     # integración con una pasarela de pagos como Stripe o PayPal.
     if state['cart_total'] > 0:
         state['payment_successful'] = True
         state['message'] = "Pago procesado exitosamente."
     else:
+        # El pago falló: devolvemos las unidades al inventario y el carrito al usuario.
+        restore_stock(lines)
+        _reopen_cart(state)
+        state['stock_lines'] = {}
         state['payment_successful'] = False
         state['error'] = True
         state['message'] = "El total del carrito es cero, no se puede procesar el pago."
@@ -59,24 +104,46 @@ def create_invoice(state: AgentState) -> AgentState:
     print("--- 🧾 Creando factura ---")
     try:
         user = User.objects.get(id=state['user_id'])
-        cart = Cart.objects.get(id=state['cart_id'])
-        
-        # Crear la factura en la base de datos
-        invoice = Invoice.objects.create(
-            user=user,
-            total_amount=state['cart_total']
-        )
-        
-        # Marcar el carrito como "comprado"
-        cart.ordered = True
-        cart.save()
-        
+        lines = state['stock_lines']
+        products = Product.objects.in_bulk(lines.keys())
+
+        with transaction.atomic():
+            # Crear la factura en la base de datos
+            invoice = Invoice.objects.create(
+                user=user,
+                total_amount=state['cart_total']
+            )
+
+            # Las líneas facturadas son las mismas que descontó process_payment
+            # (el carrito ya quedó cerrado allí); también actualizan los reportes.
+            items = InvoiceItem.objects.bulk_create(
+                InvoiceItem(
+                    invoice=invoice,
+                    product=products[product_id],
+                    category_id=products[product_id].category_id,
+                    quantity=quantity,
+                    unit_price=products[product_id].price,
+                )
+                for product_id, quantity in lines.items()
+            )
+            record_sale(invoice, items)
+
+        # Las recomendaciones quedan fuera de la transacción: si fallan, la compra
+        # sigue siendo válida y `rebuild_recommendations` las pone al día.
+        try:
+            record_order(state['cart_id'])
+        except Exception as e:
+            print(f"--- ⚠️ No se pudieron actualizar las recomendaciones: {e} ---")
+
         # --- ESTA ES LA LÍNEA CLAVE QUE FALTABA ---
         state['invoice_id'] = invoice.id 
         
         state['message'] = f"Factura #{invoice.id} creada y carrito cerrado."
         return state
     except Exception as e:
+        restore_stock(state.get('stock_lines') or {})
+        _reopen_cart(state)
+        state['stock_lines'] = {}
         state['error'] = True
         state['message'] = f"Error al crear la factura: {e}"
         return state
@@ -0,0 +1,129 @@
+# core/services/inventory.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import CartItem, Product, StockReservation
+
+
+class InsufficientStock(Exception):
+    """No hay unidades suficientes para cubrir alguna de las líneas del carrito."""
+
+
+def _reservation_ttl() -> timedelta:
+    return timedelta(minutes=getattr(settings, 'CART_RESERVATION_MINUTES', 15))
+
+
+def _held_by_others(cart_id: int, now):
+    """Subconsulta: unidades reservadas (y vigentes) por otros carritos para el producto externo."""
+    held = (
+        StockReservation.objects
+        .filter(product=OuterRef('pk'), expires_at__gt=now)
+        .exclude(cart_id=cart_id)
+        .values('product')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    return Coalesce(Subquery(held, output_field=IntegerField()), Value(0))
+
+
+def _by_product(lines: dict[int, int]) -> Case:
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in lines.items()],
+        output_field=IntegerField(),
+    )
+
+
+def get_cart_lines(cart_id: int) -> dict[int, int]:
+    """Devuelve {product_id: cantidad} agregando las líneas del carrito."""
+    rows = (
+        CartItem.objects
+        .filter(cart_id=cart_id)
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    return {product_id: total for product_id, total in rows if total}
+
+
+def reserve_stock(cart, product, quantity: int) -> bool:
+    """
+    Reserva `quantity` unidades adicionales de `product` para `cart` y renueva
+    la expiración. La reserva cubre la línea completa del carrito (lo que ya
+    tenía más lo nuevo), así que una reserva vencida se recupera entera.
+    Devuelve False si el stock libre no alcanza.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # En SQLite la transacción IMMEDIATE ya serializa a los escritores;
+        # en otros motores el bloqueo de la fila del producto hace lo mismo.
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        in_cart = (
+            CartItem.objects
+            .filter(cart=cart, product=product)
+            .aggregate(total=Sum('quantity'))['total'] or 0
+        )
+        held = (
+            StockReservation.objects
+            .filter(product=product, expires_at__gt=now)
+            .exclude(cart=cart)
+            .aggregate(total=Sum('quantity'))['total'] or 0
+        )
+        wanted = in_cart + quantity
+        if product.stock - held < wanted:
+            return False
+        StockReservation.objects.update_or_create(
+            cart=cart,
+            product=product,
+            defaults={'quantity': wanted, 'expires_at': now + _reservation_ttl()},
+        )
+    return True
+
+
+def release_stock(cart, product, quantity: int | None = None) -> None:
+    """Libera `quantity` unidades reservadas (o toda la reserva si es None)."""
+    reservations = StockReservation.objects.filter(cart=cart, product=product)
+    if quantity is None:
+        reservations.delete()
+        return
+    reservations.filter(quantity__lte=quantity).delete()
+    reservations.filter(quantity__gt=quantity).update(quantity=F('quantity') - quantity)
+
+
+def purge_expired_reservations() -> int:
+    """Elimina las reservas vencidas. Ya no cuentan para el stock; esto solo limpia la tabla."""
+    deleted, _ = StockReservation.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def commit_stock(cart_id: int, lines: dict[int, int]) -> None:
+    """
+    Descuenta el stock de todas las líneas del carrito en un único UPDATE
+    condicional (`stock >= cantidad + reservado por otros`). Si alguna línea no
+    alcanza, no se descuenta nada y se lanza InsufficientStock.
+    """
+    if not lines:
+        return
+    quantity = _by_product(lines)
+    with transaction.atomic():
+        updated = (
+            Product.objects
+            .filter(pk__in=lines.keys(), stock__gte=quantity + _held_by_others(cart_id, timezone.now()))
+            .update(stock=F('stock') - quantity, updated_at=timezone.now())
+        )
+        if updated != len(lines):
+            raise InsufficientStock("No hay stock suficiente para completar la compra.")
+        StockReservation.objects.filter(cart_id=cart_id).delete()
+
+
+def restore_stock(lines: dict[int, int]) -> None:
+    """Devuelve al inventario las unidades descontadas por commit_stock (compensación)."""
+    if not lines:
+        return
+    quantity = _by_product(lines)
+    Product.objects.filter(pk__in=lines.keys()).update(stock=F('stock') + quantity, updated_at=timezone.now())
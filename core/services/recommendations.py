@@ -0,0 +1,176 @@
+# core/services/recommendations.py
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from core.models import CartItem, ProductCoOccurrence, RelatedProduct
+
+
+def _top_k() -> int:
+    return getattr(settings, 'RECOMMENDATIONS_TOP_K', 10)
+
+
+def _refresh_related(product_id: int, top_k: int) -> None:
+    """Recalcula el top-K de un producto leyendo solo sus K mejores pares (índice product, -count)."""
+    top = (
+        ProductCoOccurrence.objects
+        .filter(product_id=product_id)
+        .order_by('-count', 'other_id')
+        .values_list('other_id', 'count')[:top_k]
+    )
+    RelatedProduct.objects.filter(product_id=product_id).delete()
+    RelatedProduct.objects.bulk_create(
+        RelatedProduct(product_id=product_id, related_id=other_id, rank=rank, score=count)
+        for rank, (other_id, count) in enumerate(top, start=1)
+    )
+
+
+def record_order(cart_id: int) -> None:
+    """
+    Suma un pedido recién cerrado a la matriz de co-ocurrencia y actualiza el
+    top-K solo de los productos del pedido (los demás no cambian).
+    """
+    product_ids = sorted(set(CartItem.objects.filter(cart_id=cart_id).values_list('product_id', flat=True)))
+    if len(product_ids) < 2:
+        return
+    top_k = _top_k()
+    with transaction.atomic():
+        pairs = ProductCoOccurrence.objects.filter(product_id__in=product_ids, other_id__in=product_ids)
+        existing = set(pairs.values_list('product_id', 'other_id'))
+        pairs.update(count=F('count') + 1)
+        ProductCoOccurrence.objects.bulk_create(
+            ProductCoOccurrence(product_id=a, other_id=b, count=1)
+            for a in product_ids for b in product_ids
+            if a != b and (a, b) not in existing
+        )
+        for product_id in product_ids:
+            _refresh_related(product_id, top_k)
+
+
+def _load_order_lines(chunk_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Lee (cart_id, product_id) de los carritos comprados por bloques de pk."""
+    carts, products = [], []
+    last_id = 0
+    while True:
+        rows = list(
+            CartItem.objects
+            .filter(pk__gt=last_id, cart__ordered=True)
+            .order_by('pk')
+            .values_list('pk', 'cart_id', 'product_id')[:chunk_size]
+        )
+        if not rows:
+            break
+        chunk = np.array(rows, dtype=np.int64)
+        carts.append(chunk[:, 1])
+        products.append(chunk[:, 2])
+        last_id = rows[-1][0]
+    if not carts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(carts), np.concatenate(products)
+
+
+def co_occurrence_matrix(cart_ids: np.ndarray, product_ids: np.ndarray):
+    """
+    Devuelve (ids de producto, matriz CSR productos x productos) donde cada
+    celda es el número de carritos que contienen ambos productos.
+    """
+    _, cart_index = np.unique(cart_ids, return_inverse=True)
+    products, product_index = np.unique(product_ids, return_inverse=True)
+    orders = sparse.csr_matrix(
+        (np.ones(len(cart_index), dtype=np.int32), (cart_index, product_index)),
+        shape=(cart_index.max(initial=-1) + 1, len(products)),
+    )
+    # Un producto repetido en el mismo carrito cuenta una sola vez.
+    orders.data[:] = 1
+    matrix = (orders.T @ orders).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    return products, matrix
+
+
+def top_k_neighbours(products: np.ndarray, matrix, top_k: int):
+    """Genera (product_id, [(related_id, count), ...]) con el mismo orden que _refresh_related."""
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == end:
+            continue
+        others = products[matrix.indices[start:end]]
+        counts = matrix.data[start:end]
+        if len(counts) > top_k:
+            # Se conservan todos los empatados con el K-ésimo conteo: el corte
+            # final por id lo decide el lexsort, igual que en _refresh_related.
+            cutoff = np.partition(counts, len(counts) - top_k)[len(counts) - top_k]
+            keep = counts >= cutoff
+            others, counts = others[keep], counts[keep]
+        order = np.lexsort((others, -counts))[:top_k]
+        yield int(products[row]), list(zip(others[order].tolist(), counts[order].tolist()))
+
+
+def rebuild_recommendations(chunk_size: int = 100_000) -> dict:
+    """Recalcula desde cero la matriz de co-ocurrencia y el top-K de todos los productos."""
+    top_k = _top_k()
+    cart_ids, product_ids = _load_order_lines(chunk_size)
+    products, matrix = co_occurrence_matrix(cart_ids, product_ids)
+    coo = matrix.tocoo()
+
+    with transaction.atomic():
+        ProductCoOccurrence.objects.all().delete()
+        RelatedProduct.objects.all().delete()
+        ProductCoOccurrence.objects.bulk_create(
+            (
+                ProductCoOccurrence(product_id=product_id, other_id=other_id, count=count)
+                for product_id, other_id, count in zip(
+                    products[coo.row].tolist(), products[coo.col].tolist(), coo.data.tolist()
+                )
+            ),
+            batch_size=5000,
+        )
+        RelatedProduct.objects.bulk_create(
+            (
+                RelatedProduct(product_id=product_id, related_id=related_id, rank=rank, score=count)
+                for product_id, neighbours in top_k_neighbours(products, matrix, top_k)
+                for rank, (related_id, count) in enumerate(neighbours, start=1)
+            ),
+            batch_size=5000,
+        )
+
+    return {'order_lines': len(cart_ids), 'products': len(products), 'pairs': matrix.nnz}
+
+
+def related_products(product_id: int, limit: int | None = None):
+    """Productos comprados junto a `product_id`, leídos del top-K precalculado."""
+    return [
+        row.related
+        for row in (
+            RelatedProduct.objects
+            .filter(product_id=product_id)
+            .select_related('related__category')
+            .order_by('rank')[:limit or _top_k()]
+        )
+    ]
+
+
+def related_to_cart(product_ids, limit: int = 4):
+    """
+    Sugerencias para un carrito: combina los top-K de sus productos y descarta
+    los que ya están en él. Cuesta O(len(product_ids) * K).
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return []
+    scores = {}
+    rows = (
+        RelatedProduct.objects
+        .filter(product_id__in=product_ids)
+        .exclude(related_id__in=product_ids)
+        .select_related('related__category')
+    )
+    for row in rows:
+        related, score = scores.get(row.related_id, (row.related, 0))
+        scores[row.related_id] = (related, score + row.score)
+    ranked = sorted(scores.items(), key=lambda item: (-item[1][1], item[0]))
+    return [related for _, (related, _) in ranked[:limit]]
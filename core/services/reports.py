@@ -0,0 +1,167 @@
+# core/services/reports.py
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import CategoryDailySales, DailySales, Invoice, InvoiceItem, ProductDailySales
+
+GROUP_BY_CHOICES = ('day', 'product', 'category')
+# Filas máximas del reporte por producto o categoría (los de mayor venta).
+DEFAULT_REPORT_LIMIT = 50
+MAX_REPORT_LIMIT = 1000
+
+
+def _bump(model, lookup: dict, **amounts) -> None:
+    """Suma `amounts` a la fila de `lookup`, creándola si todavía no existe."""
+    increments = {field: F(field) + value for field, value in amounts.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        # Savepoint: si otra transacción creó la fila primero (primera venta del
+        # día en paralelo, p. ej. en PostgreSQL), el choque con la restricción
+        # única no aborta el checkout y basta con repetir el UPDATE.
+        with transaction.atomic():
+            model.objects.create(**lookup, **amounts)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**increments)
+
+
+def record_sale(invoice: Invoice, items) -> None:
+    """
+    Actualiza los agregados con una factura recién creada. Debe llamarse dentro
+    de la misma transacción que crea la factura.
+    """
+    day = timezone.localdate(invoice.created_at)
+    by_product = defaultdict(lambda: [Decimal('0'), 0])
+    by_category = defaultdict(lambda: [Decimal('0'), 0])
+    for item in items:
+        subtotal = item.get_subtotal()
+        by_product[item.product_id][0] += subtotal
+        by_product[item.product_id][1] += item.quantity
+        by_category[item.category_id][0] += subtotal
+        by_category[item.category_id][1] += item.quantity
+
+    _bump(
+        DailySales, {'date': day},
+        revenue=invoice.total_amount,
+        units=sum(units for _, units in by_product.values()),
+        orders=1,
+    )
+    for product_id, (revenue, units) in by_product.items():
+        _bump(ProductDailySales, {'date': day, 'product_id': product_id}, revenue=revenue, units=units)
+    for category_id, (revenue, units) in by_category.items():
+        _bump(CategoryDailySales, {'date': day, 'category_id': category_id}, revenue=revenue, units=units)
+
+
+def _invoice_id_chunks(chunk_size: int):
+    """Recorre las facturas por rangos de id (keyset), sin OFFSET."""
+    last_id = 0
+    while True:
+        ids = list(
+            Invoice.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids[0], ids[-1]
+        last_id = ids[-1]
+
+
+def rebuild_rollups(chunk_size: int = 5000) -> dict:
+    """
+    Recalcula desde cero las tres tablas de agregados. Las facturas se agregan
+    en la base de datos por bloques de `chunk_size`; las tablas se reemplazan en
+    una sola transacción para que los lectores nunca las vean vacías.
+    """
+    tz = timezone.get_current_timezone()
+    daily = defaultdict(lambda: {'revenue': Decimal('0'), 'units': 0, 'orders': 0})
+    by_product = defaultdict(lambda: {'revenue': Decimal('0'), 'units': 0})
+    by_category = defaultdict(lambda: {'revenue': Decimal('0'), 'units': 0})
+
+    for first_id, last_id in _invoice_id_chunks(chunk_size):
+        invoices = (
+            Invoice.objects
+            .filter(pk__range=(first_id, last_id))
+            .annotate(day=TruncDate('created_at', tzinfo=tz))
+            .values('day')
+            .annotate(revenue=Sum('total_amount'), orders=Count('pk'))
+        )
+        for row in invoices:
+            daily[row['day']]['revenue'] += row['revenue']
+            daily[row['day']]['orders'] += row['orders']
+
+        items = (
+            InvoiceItem.objects
+            .filter(invoice__gte=first_id, invoice__lte=last_id)
+            .annotate(day=TruncDate('invoice__created_at', tzinfo=tz))
+            .values('day', 'product_id', 'category_id')
+            .annotate(revenue=Sum(F('unit_price') * F('quantity')), units=Sum('quantity'))
+        )
+        for row in items:
+            daily[row['day']]['units'] += row['units']
+            for totals in (by_product[row['day'], row['product_id']], by_category[row['day'], row['category_id']]):
+                totals['revenue'] += row['revenue']
+                totals['units'] += row['units']
+
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        ProductDailySales.objects.all().delete()
+        CategoryDailySales.objects.all().delete()
+        DailySales.objects.bulk_create(
+            (DailySales(date=day, **totals) for day, totals in daily.items()),
+            batch_size=chunk_size,
+        )
+        ProductDailySales.objects.bulk_create(
+            (ProductDailySales(date=day, product_id=product_id, **totals)
+             for (day, product_id), totals in by_product.items()),
+            batch_size=chunk_size,
+        )
+        CategoryDailySales.objects.bulk_create(
+            (CategoryDailySales(date=day, category_id=category_id, **totals)
+             for (day, category_id), totals in by_category.items()),
+            batch_size=chunk_size,
+        )
+
+    return {'days': len(daily), 'product_rows': len(by_product), 'category_rows': len(by_category)}
+
+
+def sales_report(start, end, group_by: str = 'day', limit: int = DEFAULT_REPORT_LIMIT) -> dict:
+    """
+    Ventas entre `start` y `end` (inclusive) leídas solo de los agregados, nunca
+    de las facturas. Los totales y `group_by='day'` leen una fila por día del
+    rango. Por producto o categoría se agrupan las filas (día, producto) o
+    (día, categoría) con ventas en el rango, es decir hasta días x productos, y
+    se devuelven solo las `limit` de mayor venta.
+    """
+    totals = DailySales.objects.filter(date__range=(start, end)).aggregate(
+        revenue=Sum('revenue'), units=Sum('units'), orders=Sum('orders'),
+    )
+    if group_by == 'product':
+        rows = (
+            ProductDailySales.objects
+            .filter(date__range=(start, end))
+            .values('product_id', name=F('product__name'))
+            .annotate(total_revenue=Sum('revenue'), total_units=Sum('units'))
+            .order_by('-total_revenue', 'product_id')[:limit]
+        )
+    elif group_by == 'category':
+        rows = (
+            CategoryDailySales.objects
+            .filter(date__range=(start, end))
+            .values('category_id', name=F('category__name'))
+            .annotate(total_revenue=Sum('revenue'), total_units=Sum('units'))
+            .order_by('-total_revenue', 'category_id')[:limit]
+        )
+    else:
+        rows = DailySales.objects.filter(date__range=(start, end)).order_by('date')
+
+    return {
+        'revenue': totals['revenue'] or Decimal('0'),
+        'units': totals['units'] or 0,
+        'orders': totals['orders'] or 0,
+        'results': rows,
+    }
@@ -1,3 +1,900 @@
-from django.test import TestCase
+import contextlib
+import io
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from unittest import mock
+
+import numpy as np
+
+from . import admin as core_admin
+from .models import (
+    Cart, CartItem, Category, CategoryDailySales, DailySales, Invoice, Product, ProductCoOccurrence,
+    ProductDailySales, RelatedProduct, StockReservation,
+)
+from .services import checkout_agent
+from .services.cart_summary import build_cart_summary
+from .services.recommendations import (
+    co_occurrence_matrix, rebuild_recommendations, record_order, related_to_cart, top_k_neighbours,
+)
+from .services.reports import _bump, rebuild_rollups
+from .services.inventory import (
+    InsufficientStock, commit_stock, get_cart_lines, release_stock, reserve_stock, restore_stock,
+)
+from .throttling import TokenBucketThrottle
+
+
+class CartSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cliente', password='clave-segura-123')
+        categories = [Category.objects.create(name=f'Categoría {i}') for i in range(3)]
+        cls.cart = Cart.objects.create(user=cls.user)
+        CartItem.objects.bulk_create(
+            CartItem(
+                cart=cls.cart,
+                product=Product.objects.create(
+                    name=f'Producto {i}', price=Decimal('2.50'), category=categories[i % 3], stock=10,
+                ),
+                quantity=i % 4 + 1,
+            )
+            for i in range(20)
+        )
+
+    def test_cart_page_query_budget(self):
+        # Presupuesto de la vista real: sesión, usuario, carrito, items y
+        # sugerencias. No crece con el número de items ni de sugerencias.
+        self.client.force_login(self.user)
+        extra = [
+            Product.objects.create(name=f'Sugerido {i}', price=Decimal('1.00'), category=Category.objects.first())
+            for i in range(4)
+        ]
+        RelatedProduct.objects.bulk_create(
+            RelatedProduct(product=item.product, related=extra[i % 4], rank=1, score=1)
+            for i, item in enumerate(self.cart.items.all())
+        )
+
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('cart'))
+
+        self.assertEqual(len(response.context['cart'].lines), 20)
+        self.assertEqual(len(response.context['related_products']), 4)
+        self.assertContains(response, 'Producto 19')
+        self.assertContains(response, 'Sugerido 3')
+
+    def test_empty_cart_skips_suggestions_query(self):
+        other = User.objects.create_user(username='vacio', password='clave-segura-123')
+        Cart.objects.create(user=other)
+        self.client.force_login(other)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('cart'))
+
+        self.assertEqual(response.context['cart'].lines, ())
+
+    def test_totals_are_computed_once_from_the_lines(self):
+        summary = build_cart_summary(self.cart)
+
+        expected = sum(Decimal('2.50') * (i % 4 + 1) for i in range(20))
+        self.assertEqual(summary.total, expected)
+        self.assertEqual(summary.total, self.cart.get_total())
+        self.assertEqual([line.subtotal for line in summary.lines[:4]],
+                         [Decimal('2.50'), Decimal('5.00'), Decimal('7.50'), Decimal('10.00')])
+
+    def test_cart_view_renders_summary(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('cart'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cart'].total, self.cart.get_total())
+        self.assertContains(response, f"${response.context['cart'].total}", count=2)
+
+
+
+def run_nodes(state, *nodes):
+    """Ejecuta nodos del grafo de checkout en orden, sin las trazas por consola."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for node in nodes:
+            state = node(state)
+            if state.get('error'):
+                break
+    return state
+
+
+class InventoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Frutas')
+        cls.user = User.objects.create_user(username='comprador', password='clave-segura-123')
+        cls.other_user = User.objects.create_user(username='otro', password='clave-segura-123')
+
+    def setUp(self):
+        self.mango = Product.objects.create(name='Mango', price=Decimal('1.50'), category=self.category, stock=5)
+        self.kiwi = Product.objects.create(name='Kiwi', price=Decimal('0.80'), category=self.category, stock=2)
+        self.cart = Cart.objects.create(user=self.user)
+        self.other_cart = Cart.objects.create(user=self.other_user)
+
+    def stock(self, product):
+        product.refresh_from_db()
+        return product.stock
+
+    def test_commit_stock_decrements_every_line(self):
+        commit_stock(self.cart.id, {self.mango.id: 3, self.kiwi.id: 2})
+
+        self.assertEqual(self.stock(self.mango), 2)
+        self.assertEqual(self.stock(self.kiwi), 0)
+
+    def test_commit_stock_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientStock):
+            commit_stock(self.cart.id, {self.mango.id: 3, self.kiwi.id: 3})
+
+        self.assertEqual(self.stock(self.mango), 5)
+        self.assertEqual(self.stock(self.kiwi), 2)
+
+    def test_commit_stock_respects_other_carts_reservations(self):
+        self.assertTrue(reserve_stock(self.other_cart, self.kiwi, 1))
+
+        with self.assertRaises(InsufficientStock):
+            commit_stock(self.cart.id, {self.kiwi.id: 2})
+        commit_stock(self.cart.id, {self.kiwi.id: 1})
+
+        self.assertEqual(self.stock(self.kiwi), 1)
+
+    def test_commit_stock_consumes_own_reservation(self):
+        CartItem.objects.create(cart=self.cart, product=self.kiwi, quantity=2)
+        self.assertTrue(reserve_stock(self.cart, self.kiwi, 0))
+
+        commit_stock(self.cart.id, get_cart_lines(self.cart.id))
+
+        self.assertEqual(self.stock(self.kiwi), 0)
+        self.assertFalse(StockReservation.objects.filter(cart=self.cart).exists())
+
+    def test_restore_stock_returns_units(self):
+        commit_stock(self.cart.id, {self.mango.id: 4})
+
+        restore_stock({self.mango.id: 4})
+
+        self.assertEqual(self.stock(self.mango), 5)
+
+    def test_reserve_stock_rejects_beyond_free_stock(self):
+        self.assertTrue(reserve_stock(self.cart, self.kiwi, 2))
+
+        self.assertFalse(reserve_stock(self.other_cart, self.kiwi, 1))
+
+    def test_release_stock_frees_units_for_other_carts(self):
+        CartItem.objects.create(cart=self.cart, product=self.kiwi, quantity=2)
+        reserve_stock(self.cart, self.kiwi, 0)
+
+        release_stock(self.cart, self.kiwi, 1)
+        self.assertEqual(StockReservation.objects.get(cart=self.cart).quantity, 1)
+        self.assertTrue(reserve_stock(self.other_cart, self.kiwi, 1))
+
+        release_stock(self.cart, self.kiwi)
+        self.assertFalse(StockReservation.objects.filter(cart=self.cart).exists())
+
+    def test_expired_reservation_is_renewed_for_the_whole_line(self):
+        CartItem.objects.create(cart=self.cart, product=self.mango, quantity=3)
+        StockReservation.objects.create(
+            cart=self.cart, product=self.mango, quantity=3, expires_at=timezone.now() - timedelta(minutes=1),
+        )
+
+        self.assertTrue(reserve_stock(self.cart, self.mango, 1))
+
+        reservation = StockReservation.objects.get(cart=self.cart, product=self.mango)
+        self.assertEqual(reservation.quantity, 4)
+        self.assertGreater(reservation.expires_at, timezone.now())
+
+    def test_add_item_returns_409_without_stock(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post(reverse('cart-add-item'), {'product_id': self.kiwi.id, 'quantity': 3})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(CartItem.objects.filter(product=self.kiwi).exists())
+
+    def checkout_state(self):
+        CartItem.objects.create(cart=self.cart, product=self.mango, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.kiwi, quantity=1)
+        return {'user_id': self.user.id, 'cart_id': self.cart.id}
+
+    def test_checkout_decrements_stock_and_creates_invoice(self):
+        state = run_nodes(
+            self.checkout_state(),
+            checkout_agent.get_cart_details, checkout_agent.process_payment, checkout_agent.create_invoice,
+        )
+
+        self.assertFalse(state['error'])
+        self.assertEqual(self.stock(self.mango), 3)
+        self.assertEqual(self.stock(self.kiwi), 1)
+        self.assertTrue(Invoice.objects.filter(pk=state['invoice_id']).exists())
+
+    def test_checkout_fails_without_stock(self):
+        state = self.checkout_state()
+        CartItem.objects.filter(product=self.kiwi).update(quantity=3)
+
+        state = run_nodes(
+            state, checkout_agent.get_cart_details, checkout_agent.process_payment, checkout_agent.create_invoice,
+        )
+
+        self.assertTrue(state['error'])
+        self.assertEqual(self.stock(self.mango), 5)
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_payment_failure_restores_stock_and_reopens_cart(self):
+        state = run_nodes(self.checkout_state(), checkout_agent.get_cart_details)
+        # Total cero: la simulación de pago lo rechaza.
+        Product.objects.update(price=0)
+
+        state = run_nodes(state, checkout_agent.process_payment)
+
+        self.assertTrue(state['error'])
+        self.assertEqual(self.stock(self.mango), 5)
+        self.assertEqual(self.stock(self.kiwi), 2)
+        self.cart.refresh_from_db()
+        self.assertFalse(self.cart.ordered)
+
+    def test_invoice_failure_restores_stock_and_rolls_back_invoice(self):
+        state = run_nodes(self.checkout_state(), checkout_agent.get_cart_details, checkout_agent.process_payment)
+        self.assertEqual(self.stock(self.mango), 3)
+
+        with mock.patch.object(checkout_agent, 'record_sale', side_effect=RuntimeError('boom')):
+            state = run_nodes(state, checkout_agent.create_invoice)
+
+        self.assertTrue(state['error'])
+        self.assertEqual(self.stock(self.mango), 5)
+        self.assertEqual(self.stock(self.kiwi), 2)
+        self.assertFalse(Invoice.objects.exists())
+        self.cart.refresh_from_db()
+        self.assertFalse(self.cart.ordered)
+
+    def test_double_submit_takes_stock_once(self):
+        nodes = (checkout_agent.get_cart_details, checkout_agent.process_payment, checkout_agent.create_invoice)
+        first = run_nodes(self.checkout_state(), nodes[0])
+        second = run_nodes({'user_id': self.user.id, 'cart_id': self.cart.id}, nodes[0])
+
+        first = run_nodes(first, checkout_agent.process_payment)
+        second = run_nodes(second, checkout_agent.process_payment)
+        first = run_nodes(first, checkout_agent.create_invoice)
+
+        self.assertFalse(first['error'])
+        self.assertTrue(second['error'])
+        self.assertEqual(self.stock(self.mango), 3)
+        self.assertEqual(self.stock(self.kiwi), 1)
+        self.assertEqual(Invoice.objects.count(), 1)
+        self.assertEqual(DailySales.objects.get().orders, 1)
+
+    def test_invoice_lines_match_the_stock_taken(self):
+        state = run_nodes(self.checkout_state(), checkout_agent.get_cart_details, checkout_agent.process_payment)
+        # Una línea agregada a mano después de descontar el stock no se factura.
+        CartItem.objects.create(cart=self.cart, product=self.mango, quantity=1)
+
+        state = run_nodes(state, checkout_agent.create_invoice)
+
+        invoice = Invoice.objects.get(pk=state['invoice_id'])
+        self.assertEqual(
+            sorted(invoice.items.values_list('product_id', 'quantity')),
+            sorted([(self.mango.id, 2), (self.kiwi.id, 1)]),
+        )
+        self.assertEqual(invoice.total_amount, Decimal('3.80'))
+        self.assertEqual(self.stock(self.mango), 3)
+
+
+
+class SalesReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='clave-segura-123', is_staff=True)
+        cls.buyer = User.objects.create_user(username='cliente', password='clave-segura-123')
+        cls.fruits = Category.objects.create(name='Frutas')
+        cls.chairs = Category.objects.create(name='Sillas')
+        cls.mango = Product.objects.create(name='Mango', price=Decimal('1.50'), category=cls.fruits, stock=100)
+        cls.kiwi = Product.objects.create(name='Kiwi', price=Decimal('0.80'), category=cls.fruits, stock=100)
+        cls.chair = Product.objects.create(name='Silla', price=Decimal('25.00'), category=cls.chairs, stock=100)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        for lines in ([(self.mango, 2), (self.kiwi, 5)], [(self.chair, 1), (self.mango, 1)], [(self.chair, 2)]):
+            cart = Cart.objects.create(user=self.buyer)
+            for product, quantity in lines:
+                CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+            state = run_nodes(
+                {'user_id': self.buyer.id, 'cart_id': cart.id},
+                checkout_agent.get_cart_details, checkout_agent.process_payment, checkout_agent.create_invoice,
+            )
+            self.assertFalse(state['error'])
+
+    def snapshot(self):
+        return (
+            sorted(DailySales.objects.values_list('date', 'revenue', 'units', 'orders')),
+            sorted(ProductDailySales.objects.values_list('date', 'product_id', 'revenue', 'units')),
+            sorted(CategoryDailySales.objects.values_list('date', 'category_id', 'revenue', 'units')),
+        )
+
+    def report(self, **params):
+        return self.client.get(reverse('sales-report'), params)
+
+    def test_incremental_rollups_match_rebuild(self):
+        incremental = self.snapshot()
+
+        rebuild_rollups(chunk_size=2)
+
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_rebuild_restores_missing_rollups(self):
+        incremental = self.snapshot()
+        DailySales.objects.all().delete()
+        ProductDailySales.objects.update(units=0)
+
+        rebuild_rollups()
+
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_day_totals(self):
+        today = timezone.localdate()
+
+        response = self.report(start=today.isoformat(), end=today.isoformat())
+
+        self.assertEqual(response.status_code, 200)
+        # 3.00 + 4.00 + 25.00 + 1.50 + 50.00
+        self.assertEqual(response.data['revenue'], '83.50')
+        self.assertEqual(response.data['units'], 11)
+        self.assertEqual(response.data['orders'], 3)
+        self.assertEqual(response.data['results'], [
+            {'date': today.isoformat(), 'revenue': '83.50', 'units': 11, 'orders': 3},
+        ])
+
+    def test_product_totals(self):
+        response = self.report(group_by='product')
+
+        self.assertEqual(
+            [(row['name'], row['revenue'], row['units']) for row in response.data['results']],
+            [('Silla', '75.00', 3), ('Mango', '4.50', 3), ('Kiwi', '4.00', 5)],
+        )
+
+    def test_limit_keeps_top_sellers(self):
+        response = self.report(group_by='product', limit=2)
+
+        self.assertEqual([row['name'] for row in response.data['results']], ['Silla', 'Mango'])
+        # Los totales del rango no dependen del límite.
+        self.assertEqual(response.data['revenue'], '83.50')
+
+    def test_bump_retries_when_another_transaction_creates_the_row(self):
+        today = timezone.localdate()
+        update = QuerySet.update
+        calls = []
+
+        def racing_update(queryset, **kwargs):
+            # El primer UPDATE no ve la fila: la creó otra transacción en paralelo.
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            _bump(DailySales, {'date': today}, revenue=Decimal('1.00'), units=1, orders=1)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(DailySales.objects.get(date=today).orders, 4)
+
+    def test_category_totals(self):
+        response = self.report(group_by='category')
+
+        self.assertEqual(
+            [(row['name'], row['revenue'], row['units']) for row in response.data['results']],
+            [('Sillas', '75.00', 3), ('Frutas', '8.50', 8)],
+        )
+
+    def test_date_range_excludes_other_days(self):
+        today = timezone.localdate()
+        DailySales.objects.create(date=today - timedelta(days=40), revenue=Decimal('99.00'), units=1, orders=1)
+
+        recent = self.report()
+        everything = self.report(start=(today - timedelta(days=40)).isoformat())
+        old_only = self.report(start=(today - timedelta(days=40)).isoformat(), end=(today - timedelta(days=1)).isoformat())
+
+        self.assertEqual(recent.data['revenue'], '83.50')
+        self.assertEqual(everything.data['revenue'], '182.50')
+        self.assertEqual(old_only.data['revenue'], '99.00')
+
+    def test_invalid_parameters_return_400(self):
+        for params in (
+            {'start': '2026-13-01'},
+            {'end': 'ayer'},
+            {'start': '2026-10-10', 'end': '2026-10-01'},
+            {'group_by': 'user'},
+            {'group_by': 'product', 'limit': '0'},
+            {'group_by': 'product', 'limit': 'todos'},
+            {'group_by': 'product', 'limit': '1001'},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.report(**params).status_code, 400)
+
+    def test_report_is_admin_only(self):
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.report().status_code, 403)
+
+        self.client.force_authenticate(None)
+        self.assertIn(self.report().status_code, (401, 403))
+
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cliente', password='clave-segura-123')
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Frutas')
+        self.mango = Product.objects.create(name='Mango', price=Decimal('1.50'), category=self.category, stock=10)
+        self.kiwi = Product.objects.create(name='Kiwi', price=Decimal('0.80'), category=self.category, stock=10)
+        self.client = APIClient()
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNotModified(self, url, etag):
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_catalog_reads_return_304_without_serializing(self):
+        for url in (
+            reverse('product-list'), reverse('category-list'),
+            reverse('product-detail', args=[self.mango.id]), reverse('category-detail', args=[self.category.id]),
+        ):
+            with self.subTest(url=url):
+                etag = self.etag(url)
+                with self.assertNumQueries(2 if url == reverse('product-list') else 1):
+                    self.assertNotModified(url, etag)
+
+    def test_if_modified_since_returns_304(self):
+        url = reverse('product-detail', args=[self.mango.id])
+        response = self.client.get(url)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_after_deletion_returns_fresh_lists(self):
+        # Una fecha posterior a todo updated_at: solo un borrado cambia las listas.
+        since = http_date(timezone.now().timestamp() + 60)
+        Category.objects.create(name='Sillas')
+
+        self.mango.delete()
+        Category.objects.filter(name='Sillas').delete()
+
+        products = self.client.get(reverse('product-list'), HTTP_IF_MODIFIED_SINCE=since)
+        categories = self.client.get(reverse('category-list'), HTTP_IF_MODIFIED_SINCE=since)
+
+        self.assertEqual(products.status_code, 200)
+        self.assertEqual([row['name'] for row in products.json()], ['Kiwi'])
+        self.assertEqual(categories.status_code, 200)
+        self.assertEqual([row['name'] for row in categories.json()], ['Frutas'])
+        self.assertNotIn('Last-Modified', products)
+
+    def test_product_change_invalidates_list_and_detail(self):
+        list_etag = self.etag(reverse('product-list'))
+        detail_etag = self.etag(reverse('product-detail', args=[self.mango.id]))
+
+        self.mango.price = Decimal('2.00')
+        self.mango.save()
+
+        self.assertModified(reverse('product-list'), list_etag)
+        self.assertModified(reverse('product-detail', args=[self.mango.id]), detail_etag)
+
+    def test_stock_change_invalidates_product_list(self):
+        etag = self.etag(reverse('product-list'))
+
+        commit_stock(0, {self.mango.id: 1})
+
+        self.assertModified(reverse('product-list'), etag)
+
+    def test_product_deletion_invalidates_list(self):
+        etag = self.etag(reverse('product-list'))
+
+        # Borrar el más antiguo no mueve MAX(updated_at): lo detecta el COUNT.
+        self.mango.delete()
+
+        self.assertModified(reverse('product-list'), etag)
+
+    def test_category_rename_invalidates_products_and_categories(self):
+        product_etag = self.etag(reverse('product-list'))
+        category_etag = self.etag(reverse('category-list'))
+
+        self.category.name = 'Frutas tropicales'
+        self.category.save()
+
+        self.assertModified(reverse('product-list'), product_etag)
+        self.assertModified(reverse('category-list'), category_etag)
+
+    def test_category_payload_does_not_expose_updated_at(self):
+        response = self.client.get(reverse('category-list'))
+
+        self.assertEqual(response.json(), [{'id': self.category.id, 'name': 'Frutas'}])
+
+    def test_invalid_pk_returns_404(self):
+        for url in ('/api/products/abc/', '/api/categories/abc/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cart_etag_tracks_items_products_and_categories(self):
+        self.client.force_authenticate(self.user)
+        cart = Cart.objects.create(user=self.user)
+        item = CartItem.objects.create(cart=cart, product=self.mango, quantity=1)
+        url = reverse('cart-view')
+
+        etag = self.etag(url)
+        self.assertNotModified(url, etag)
+
+        CartItem.objects.create(cart=cart, product=self.kiwi, quantity=1)
+        self.assertModified(url, etag)
+
+        etag = self.etag(url)
+        item.quantity = 3
+        item.save()
+        self.assertModified(url, etag)
+
+        etag = self.etag(url)
+        self.kiwi.price = Decimal('0.90')
+        self.kiwi.save()
+        self.assertModified(url, etag)
+
+        etag = self.etag(url)
+        self.category.name = 'Frutas tropicales'
+        self.category.save()
+        self.assertModified(url, etag)
+
+        etag = self.etag(url)
+        item.delete()
+        self.assertModified(url, etag)
+
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cliente', password='clave-segura-123')
+        category = Category.objects.create(name='Varios')
+        cls.products = [
+            Product.objects.create(name=f'Producto {i}', price=Decimal('1.00'), category=category, stock=100)
+            for i in range(5)
+        ]
+
+    def order(self, *indexes):
+        cart = Cart.objects.create(user=self.user, ordered=True)
+        for i in indexes:
+            CartItem.objects.create(cart=cart, product=self.products[i], quantity=1)
+        record_order(cart.id)
+        return cart
+
+    def pair_counts(self):
+        return sorted(ProductCoOccurrence.objects.values_list('product_id', 'other_id', 'count'))
+
+    def related_ids(self, index):
+        return list(
+            RelatedProduct.objects.filter(product=self.products[index]).values_list('related_id', flat=True)
+        )
+
+    def test_record_order_counts_pairs_both_ways(self):
+        p0, p1, p2 = (product.id for product in self.products[:3])
+
+        self.order(0, 1)
+        self.order(0, 1, 2)
+
+        self.assertEqual(self.pair_counts(), sorted([
+            (p0, p1, 2), (p1, p0, 2), (p0, p2, 1), (p2, p0, 1), (p1, p2, 1), (p2, p1, 1),
+        ]))
+
+    def test_single_product_orders_are_ignored(self):
+        self.order(0)
+
+        self.assertFalse(ProductCoOccurrence.objects.exists())
+
+    def test_record_order_refreshes_top_k(self):
+        self.order(0, 2)
+        self.order(0, 1)
+        self.order(0, 1)
+
+        self.assertEqual(self.related_ids(0), [self.products[1].id, self.products[2].id])
+        self.assertEqual(
+            list(RelatedProduct.objects.filter(product=self.products[0]).values_list('rank', 'score')),
+            [(1, 2), (2, 1)],
+        )
+
+    @override_settings(RECOMMENDATIONS_TOP_K=2)
+    def test_top_k_is_capped(self):
+        self.order(0, 1, 2, 3)
+        self.order(0, 3)
+        self.order(0, 2)
+
+        # Empates por conteo se ordenan por id de producto.
+        self.assertEqual(self.related_ids(0), [self.products[2].id, self.products[3].id])
+
+    def test_rebuild_matches_incremental(self):
+        for indexes in ((0, 1), (0, 1, 2), (2, 3, 4), (1, 4), (0, 4), (3, 4), (0, 1, 2, 3, 4)):
+            self.order(*indexes)
+        # Un carrito sin comprar no cuenta ni en el incremental ni en el rebuild.
+        open_cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=open_cart, product=self.products[0])
+        CartItem.objects.create(cart=open_cart, product=self.products[3])
+        incremental = (self.pair_counts(), list(RelatedProduct.objects.values_list('product', 'related', 'rank', 'score')))
+
+        result = rebuild_recommendations(chunk_size=3)
+
+        self.assertEqual(
+            (self.pair_counts(), list(RelatedProduct.objects.values_list('product', 'related', 'rank', 'score'))),
+            incremental,
+        )
+        self.assertEqual(result['products'], 5)
+
+    def test_co_occurrence_matrix_counts_each_cart_once(self):
+        carts = np.array([1, 1, 1, 2, 2, 3])
+        products = np.array([10, 20, 20, 10, 30, 30])
+
+        ids, matrix = co_occurrence_matrix(carts, products)
+
+        self.assertEqual(ids.tolist(), [10, 20, 30])
+        self.assertEqual(matrix.toarray().tolist(), [[0, 1, 1], [1, 0, 0], [1, 0, 0]])
+
+    def test_top_k_neighbours_orders_by_count_then_id(self):
+        carts = np.array([1, 1, 2, 2, 3, 3, 4, 4])
+        products = np.array([10, 30, 10, 30, 10, 20, 10, 40])
+
+        neighbours = dict(top_k_neighbours(*co_occurrence_matrix(carts, products), top_k=2))
+
+        self.assertEqual(neighbours[10], [(30, 2), (20, 1)])
+        self.assertEqual(neighbours[20], [(10, 1)])
+
+    def test_top_k_neighbours_breaks_boundary_ties_by_id(self):
+        rng = np.random.default_rng(7)
+        # El producto 1 aparece con 2..30 una vez y con 31 dos veces: con K=3
+        # el corte cae dentro del empate y deben quedar los ids más bajos.
+        pairs = [(cart, other) for cart, other in enumerate(range(2, 32))] + [(100, 31)]
+        for _ in range(20):
+            rows = [(cart, product) for cart, other in pairs for product in (1, other)]
+            rng.shuffle(rows)
+            carts, products = np.array(rows).T
+
+            neighbours = dict(top_k_neighbours(*co_occurrence_matrix(carts, products), top_k=3))
+
+            self.assertEqual(neighbours[1], [(31, 2), (2, 1), (3, 1)])
+
+    @override_settings(RECOMMENDATIONS_TOP_K=2)
+    def test_rebuild_matches_incremental_with_boundary_ties(self):
+        for indexes in ((4, 3, 2, 1, 0), (0, 4), (3, 1)):
+            self.order(*indexes)
+        incremental = list(RelatedProduct.objects.values_list('product', 'related', 'rank', 'score'))
+
+        rebuild_recommendations()
+
+        self.assertEqual(
+            list(RelatedProduct.objects.values_list('product', 'related', 'rank', 'score')), incremental,
+        )
+
+    def test_related_endpoint(self):
+        self.order(0, 1)
+
+        response = APIClient().get(reverse('product-related', args=[self.products[0].id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data], [self.products[1].id])
+
+    def test_related_endpoint_404(self):
+        client = APIClient()
+
+        self.assertEqual(client.get('/api/products/abc/related/').status_code, 404)
+        self.assertEqual(client.get('/api/products/999999/related/').status_code, 404)
+
+    def test_related_to_cart_skips_products_already_in_cart(self):
+        self.order(0, 1, 2)
+        self.order(0, 2)
+
+        suggestions = related_to_cart([self.products[0].id, self.products[1].id])
+
+        self.assertEqual([product.id for product in suggestions], [self.products[2].id])
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(username='admin', password='clave-segura-123')
+        cls.user = User.objects.create_user(username='cliente', password='clave-segura-123')
+        cls.category = Category.objects.create(name='Varios')
+        cls.products = [
+            Product.objects.create(name=name, price=Decimal('10.00'), category=cls.category, stock=100)
+            for name in ('Manzana', 'manzanilla', 'Mango', 'Pera', 'Uva')
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def changelist(self, model):
+        return reverse(f'admin:core_{model._meta.model_name}_changelist')
+
+    def run_action(self, model, action, objects):
+        return self.client.post(self.changelist(model), {
+            'action': action,
+            admin.helpers.ACTION_CHECKBOX_NAME: [obj.pk for obj in objects],
+        })
+
+    @mock.patch.object(core_admin, 'ADMIN_CHUNK_SIZE', 2)
+    def test_price_change_runs_in_chunks(self):
+        selected = self.products[:4]
+
+        with mock.patch.object(core_admin.transaction, 'atomic', wraps=core_admin.transaction.atomic) as atomic:
+            self.run_action(Product, 'change_price_up_10', selected)
+
+        self.assertEqual(atomic.call_count, 2)
+        prices = dict(Product.objects.values_list('pk', 'price'))
+        for product in selected:
+            self.assertEqual(prices[product.pk], Decimal('11.00'))
+        self.assertEqual(prices[self.products[4].pk], Decimal('10.00'))
+
+    @mock.patch.object(core_admin, 'ADMIN_CHUNK_SIZE', 1)
+    def test_purge_only_deletes_unordered_carts(self):
+        open_carts = [Cart.objects.create(user=self.user) for _ in range(3)]
+        ordered_cart = Cart.objects.create(user=self.user, ordered=True)
+        CartItem.objects.create(cart=open_carts[0], product=self.products[0])
+
+        self.run_action(Cart, 'purge_abandoned_carts', open_carts + [ordered_cart])
+
+        self.assertEqual(list(Cart.objects.values_list('pk', flat=True)), [ordered_cart.pk])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_purge_only_deletes_expired_reservations(self):
+        cart = Cart.objects.create(user=self.user)
+        now = timezone.now()
+        expired = StockReservation.objects.create(
+            cart=cart, product=self.products[0], quantity=1, expires_at=now - timedelta(minutes=1),
+        )
+        active = StockReservation.objects.create(
+            cart=cart, product=self.products[1], quantity=1, expires_at=now + timedelta(minutes=10),
+        )
+
+        self.run_action(StockReservation, 'purge_expired', [expired, active])
+
+        self.assertEqual(list(StockReservation.objects.values_list('pk', flat=True)), [active.pk])
+
+    def test_search_is_case_insensitive_prefix(self):
+        response = self.client.get(self.changelist(Product), {'q': 'MANZ'})
+
+        self.assertEqual(
+            sorted(product.name for product in response.context['cl'].result_list),
+            ['Manzana', 'manzanilla'],
+        )
+
+    def test_search_matches_accented_initial(self):
+        Product.objects.create(name='Ácido cítrico', price=Decimal('3.00'), category=self.category)
+
+        for term in ('Ácido', 'ÁCIDO', 'Ácido cít'):
+            with self.subTest(term=term):
+                response = self.client.get(self.changelist(Product), {'q': term})
+
+                self.assertEqual(
+                    [product.name for product in response.context['cl'].result_list], ['Ácido cítrico'],
+                )
+
+    def test_search_by_exact_username(self):
+        cart = Cart.objects.create(user=self.user)
+        Cart.objects.create(user=self.admin_user)
+
+        response = self.client.get(self.changelist(Cart), {'q': 'cliente'})
+
+        self.assertEqual([row.pk for row in response.context['cl'].result_list], [cart.pk])
+
+    def test_paginator_counts_exactly_below_the_cap(self):
+        Product.objects.filter(pk=self.products[-1].pk).delete()
+
+        paginator = core_admin.EstimatedCountPaginator(Product.objects.order_by('pk'), 2)
+
+        # MAX(rowid) seguiría en 5: por debajo del tope el total es exacto.
+        self.assertEqual(paginator.count, 4)
+        self.assertEqual(paginator.num_pages, 2)
+
+    @mock.patch.object(core_admin.EstimatedCountPaginator, 'max_exact_count', 2)
+    def test_paginator_uses_estimate_above_the_cap(self):
+        self.assertEqual(core_admin.EstimatedCountPaginator(Product.objects.order_by('pk'), 2).count, 5)
+        filtered = Product.objects.filter(stock__gt=0).order_by('pk')
+        self.assertEqual(core_admin.EstimatedCountPaginator(filtered, 2).count, 3)
+
+
+@override_settings(THROTTLE_BUCKETS={'register': {'burst': 2, 'rate': '1/s'}})
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        TokenBucketThrottle.buckets.clear()
+        self.now = 1000.0
+        patcher = mock.patch.object(TokenBucketThrottle, 'timer', staticmethod(lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def register(self, **extra):
+        # Payload vacío: el throttle corre antes de validar, sin tocar el hasher.
+        return self.client.post(reverse('user-register'), {}, **extra)
+
+    def test_burst_then_429_with_retry_after(self):
+        self.assertEqual(self.register().status_code, 400)
+        self.assertEqual(self.register().status_code, 400)
+
+        response = self.register()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_tokens_refill_over_time(self):
+        self.register()
+        self.register()
+        self.assertEqual(self.register().status_code, 429)
+
+        self.now += 1.0
+
+        self.assertEqual(self.register().status_code, 400)
+        self.assertEqual(self.register().status_code, 429)
+
+    def test_buckets_are_per_client(self):
+        self.register(REMOTE_ADDR='10.0.0.1')
+        self.register(REMOTE_ADDR='10.0.0.1')
+
+        self.assertEqual(self.register(REMOTE_ADDR='10.0.0.1').status_code, 429)
+        self.assertEqual(self.register(REMOTE_ADDR='10.0.0.2').status_code, 400)
+
+    @mock.patch.object(TokenBucketThrottle, 'max_buckets', 2)
+    def test_bucket_count_is_capped_evicting_idle_buckets_first(self):
+        self.register(REMOTE_ADDR='10.0.0.1')
+        self.register(REMOTE_ADDR='10.0.0.2')
+        self.register(REMOTE_ADDR='10.0.0.1')
+
+        for i in range(3, 10):
+            self.register(REMOTE_ADDR=f'10.0.0.{i}')
+            self.assertLessEqual(len(TokenBucketThrottle.buckets), 2)
+
+        self.assertEqual(list(TokenBucketThrottle.buckets), [
+            ('register', 'ip:10.0.0.8'), ('register', 'ip:10.0.0.9'),
+        ])
+
+    @mock.patch.object(TokenBucketThrottle, 'max_buckets', 2)
+    def test_recently_used_bucket_survives_eviction(self):
+        self.register(REMOTE_ADDR='10.0.0.1')
+        self.register(REMOTE_ADDR='10.0.0.1')
+        self.register(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(self.register(REMOTE_ADDR='10.0.0.1').status_code, 429)
+
+        # 10.0.0.2 es el menos reciente: sale él y 10.0.0.1 sigue sin tokens.
+        self.register(REMOTE_ADDR='10.0.0.3')
+
+        self.assertNotIn(('register', 'ip:10.0.0.2'), TokenBucketThrottle.buckets)
+        self.assertEqual(self.register(REMOTE_ADDR='10.0.0.1').status_code, 429)
+
+    def test_spoofed_forwarded_for_does_not_get_a_new_bucket(self):
+        for i in range(2):
+            self.register(REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{i}')
+
+        response = self.register(REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.0.2.99')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(list(TokenBucketThrottle.buckets), [('register', 'ip:10.0.0.1')])
+
+    @mock.patch.object(TokenBucketThrottle, 'max_buckets', 2)
+    def test_new_client_is_kept_when_every_bucket_is_in_use(self):
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            self.register(REMOTE_ADDR=ip)
+            self.register(REMOTE_ADDR=ip)
+
+        self.register(REMOTE_ADDR='10.0.0.3')
+        self.register(REMOTE_ADDR='10.0.0.3')
+
+        self.assertEqual(len(TokenBucketThrottle.buckets), 2)
+        self.assertEqual(self.register(REMOTE_ADDR='10.0.0.3').status_code, 429)
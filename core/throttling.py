@@ -0,0 +1,97 @@
+# core/throttling.py
+
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_refill_rate(rate: str) -> float:
+    """'10/min' -> tokens por segundo (mismo formato que DEFAULT_THROTTLE_RATES de DRF)."""
+    num, period = rate.split('/')
+    return int(num) / PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket por scope y por usuario (o IP si es anónimo), guardado en la
+    memoria del proceso: no toca la base de datos ni la caché. La IP sale de
+    `get_ident()` de DRF, que respeta REST_FRAMEWORK['NUM_PROXIES'].
+
+    La vista declara `throttle_scope` y settings.THROTTLE_BUCKETS define, para
+    cada scope, la capacidad (`burst`) y la recarga (`rate`, p. ej. '10/min').
+    El camino rápido (cliente con bucket) no usa locks: un `get` del diccionario
+    y el cálculo de tokens. Dos hilos del mismo cliente pueden gastar el mismo
+    token en una carrera, lo que se tolera a cambio de no serializar las
+    peticiones. Solo crear un bucket toma el lock, y con el límite lleno
+    desaloja uno en O(1) con un LRU aproximado (segunda oportunidad, ver
+    `_evict`), así que nunca hay más de `max_buckets`. Con varios procesos cada
+    uno tiene sus propios buckets.
+    """
+    # {(scope, ident): [tokens, último instante, usado]} en orden de inserción,
+    # compartido por todo el proceso.
+    buckets = OrderedDict()
+    buckets_lock = threading.Lock()
+    max_buckets = 100_000
+    # Buckets usados que se pueden saltar antes de desalojar uno igualmente.
+    eviction_probes = 8
+    timer = staticmethod(time.monotonic)
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        config = settings.THROTTLE_BUCKETS.get(scope) if scope else None
+        if config is None:
+            return True
+
+        burst = config['burst']
+        refill = parse_refill_rate(config['rate'])
+        if request.user and request.user.is_authenticated:
+            key = (scope, f"user:{request.user.pk}")
+        else:
+            key = (scope, f"ip:{self.get_ident(request)}")
+
+        now = self.timer()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            with self.buckets_lock:
+                # Otro hilo pudo crearlo (o reinsertarlo en _evict) mientras esperábamos.
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    self._evict()
+                    bucket = self.buckets[key] = [burst, now, False]
+        else:
+            bucket[2] = True
+
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * refill)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True
+        bucket[0] = tokens
+        self.wait_seconds = (1 - tokens) / refill
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+    def _evict(self):
+        """
+        Con el lock tomado, hace lugar para un bucket nuevo: saca el más
+        antiguo; si se usó desde que entró (o desde su última oportunidad) vuelve
+        al final con la marca limpia, si no se descarta. Tras `eviction_probes`
+        saltos se descarta el siguiente aunque esté en uso, para que el costo
+        sea O(1).
+        """
+        probes = self.eviction_probes
+        while len(self.buckets) >= self.max_buckets:
+            key, bucket = self.buckets.popitem(last=False)
+            if bucket[2] and probes:
+                probes -= 1
+                bucket[2] = False
+                self.buckets[key] = bucket
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 from django.views.generic import RedirectView
 
@@ -19,9 +19,10 @@ api_urlpatterns = [
     path('cart/add-item/', views.AddItemToCartView.as_view(), name='cart-add-item'),
     path('cart/remove-item/<int:product_id>/', views.RemoveItemFromCartView.as_view(), name='cart-remove-item'),
     path('checkout/', views.CheckoutView.as_view(), name='checkout'),
+    path('reports/sales/', views.SalesReportView.as_view(), name='sales-report'),
     
     # Rutas de login y refresh del token
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', views.ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
 
@@ -1,9 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.models import User
 from rest_framework import viewsets, generics, status
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.decorators import action
+from rest_framework_simplejwt.views import TokenObtainPairView
 
 # --- Modelos, Serializers y Servicios ---
 from .models import Product, Category, Cart, CartItem, Invoice
@@ -12,9 +14,23 @@ from .serializers import (
     ProductSerializer, 
     CategorySerializer, 
     CartItemSerializer,
-    CartSerializer
+    CartSerializer,
+    DailySalesSerializer,
+    ProductSalesSerializer,
+    CategorySalesSerializer,
 )
 from .services.checkout_agent import run_checkout_agent
+from .services.inventory import reserve_stock, release_stock
+from .services.reports import DEFAULT_REPORT_LIMIT, GROUP_BY_CHOICES, MAX_REPORT_LIMIT, sales_report
+from .services.recommendations import related_products, related_to_cart
+from .services.cart_summary import build_cart_summary
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from . import conditional
+from .throttling import TokenBucketThrottle
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -28,19 +44,40 @@ class UserCreateView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'register'
 
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """Login por JWT con límite de intentos (protege el hasher de contraseñas)."""
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'token'
+
+# Las lecturas del catálogo y del carrito responden 304 si el cliente ya tiene
+# la versión actual (If-None-Match / If-Modified-Since). Ver core/conditional.py.
+@method_decorator(condition(etag_func=conditional.category_list_etag), name='list')
+@method_decorator(condition(conditional.category_detail_etag, conditional.category_detail_last_modified), name='retrieve')
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
 
+@method_decorator(condition(etag_func=conditional.product_list_etag), name='list')
+@method_decorator(condition(conditional.product_detail_etag, conditional.product_detail_last_modified), name='retrieve')
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
 
+    @action(detail=True)
+    def related(self, request, pk=None):
+        """Productos comprados frecuentemente junto a este (top-K precalculado)."""
+        product = self.get_object()
+        serializer = ProductSerializer(related_products(product.id), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 class CartView(APIView):
     permission_classes = [IsAuthenticated]
+    @method_decorator(condition(etag_func=conditional.cart_etag))
     def get(self, request):
         cart, created = Cart.objects.get_or_create(user=request.user, ordered=False)
         serializer = CartSerializer(cart)
@@ -55,6 +92,8 @@ class AddItemToCartView(APIView):
             return Response({"error": "Product ID is required"}, status=status.HTTP_400_BAD_REQUEST)
         product = get_object_or_404(Product, id=product_id)
         cart, created = Cart.objects.get_or_create(user=request.user, ordered=False)
+        if not reserve_stock(cart, product, quantity):
+            return Response({"error": f"No hay stock suficiente de '{product.name}'."}, status=status.HTTP_409_CONFLICT)
         cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
         if not created:
             cart_item.quantity += quantity
@@ -71,12 +110,15 @@ class RemoveItemFromCartView(APIView):
         try:
             cart_item = CartItem.objects.get(cart=cart, product=product)
             cart_item.delete()
+            release_stock(cart, product)
             return Response({"success": f"'{product.name}' fue eliminado del carrito."}, status=status.HTTP_204_NO_CONTENT)
         except CartItem.DoesNotExist:
             return Response({"error": "Este item no se encuentra en tu carrito."}, status=status.HTTP_404_NOT_FOUND)
 
 class CheckoutView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'checkout'
     def post(self, request, *args, **kwargs):
         try:
             cart = Cart.objects.get(user=request.user, ordered=False)
@@ -90,6 +132,53 @@ class CheckoutView(APIView):
             "invoice_id": result_state.get('invoice_id')
         }, status=status.HTTP_200_OK)
 
+class SalesReportView(APIView):
+    """
+    Reporte de ventas entre dos fechas, leído de las tablas de agregados.
+    Parámetros: start, end (YYYY-MM-DD, por defecto los últimos 30 días) y
+    group_by (day, product o category). Por producto o categoría devuelve solo
+    las `limit` filas de mayor venta (por defecto 50, máximo 1000).
+    """
+    permission_classes = [IsAdminUser]
+    row_serializers = {
+        'day': DailySalesSerializer,
+        'product': ProductSalesSerializer,
+        'category': CategorySalesSerializer,
+    }
+
+    def get(self, request):
+        raw_start = request.query_params.get('start')
+        raw_end = request.query_params.get('end')
+        try:
+            end = parse_date(raw_end) if raw_end else timezone.localdate()
+            start = parse_date(raw_start) if raw_start else end and end - timedelta(days=29)
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            return Response({"error": "Fecha inválida, usa el formato YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({"error": "'start' debe ser anterior o igual a 'end'."}, status=status.HTTP_400_BAD_REQUEST)
+        group_by = request.query_params.get('group_by', 'day')
+        if group_by not in GROUP_BY_CHOICES:
+            return Response({"error": f"group_by debe ser uno de: {', '.join(GROUP_BY_CHOICES)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_REPORT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_REPORT_LIMIT:
+            return Response({"error": f"limit debe ser un entero entre 1 y {MAX_REPORT_LIMIT}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = sales_report(start, end, group_by, limit)
+        return Response({
+            "start": start,
+            "end": end,
+            "group_by": group_by,
+            "revenue": f"{report['revenue']:.2f}",
+            "units": report['units'],
+            "orders": report['orders'],
+            "results": self.row_serializers[group_by](report['results'], many=True).data,
+        }, status=status.HTTP_200_OK)
+
 
 # ====================================================================
 #                  VISTAS PARA EL FRONTEND (CON PLANTILLAS)
@@ -102,6 +191,9 @@ def product_list_view(request):
         product_id = request.POST.get('product_id')
         product = get_object_or_404(Product, id=product_id)
         cart, created = Cart.objects.get_or_create(user=request.user, ordered=False)
+        if not reserve_stock(cart, product, 1):
+            messages.error(request, f"No hay stock suficiente de '{product.name}'.")
+            return redirect('product-list-page')
         cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
         if not created:
             cart_item.quantity += 1
@@ -160,6 +252,9 @@ def cart_view(request):
         if item_id:
             cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
             if 'increment_quantity' in request.POST:
+                if not reserve_stock(cart, cart_item.product, 1):
+                    messages.error(request, f"No hay stock suficiente de '{cart_item.product.name}'.")
+                    return redirect('cart')
                 cart_item.quantity += 1
                 cart_item.save()
                 messages.success(request, f"Se actualizó la cantidad de '{cart_item.product.name}'.")
@@ -167,15 +262,31 @@ def cart_view(request):
                 if cart_item.quantity > 1:
                     cart_item.quantity -= 1
                     cart_item.save()
+                    release_stock(cart, cart_item.product, 1)
                     messages.success(request, f"Se actualizó la cantidad de '{cart_item.product.name}'.")
                 else:
                     product_name = cart_item.product.name
                     cart_item.delete()
+                    release_stock(cart, cart_item.product)
                     messages.success(request, f"Se eliminó '{product_name}' del carrito.")
             elif 'remove_item' in request.POST:
                 product_name = cart_item.product.name
                 cart_item.delete()
+                release_stock(cart, cart_item.product)
                 messages.success(request, f"Se eliminó '{product_name}' del carrito.")
+
+        elif 'add_related' in request.POST:
+            product = get_object_or_404(Product, id=request.POST.get('product_id'))
+            if not reserve_stock(cart, product, 1):
+                messages.error(request, f"No hay stock suficiente de '{product.name}'.")
+                return redirect('cart')
+            cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
+            if not created:
+                cart_item.quantity += 1
+            else:
+                cart_item.quantity = 1
+            cart_item.save()
+            messages.success(request, f"¡'{product.name}' se añadió a tu carrito!")
         
         elif 'checkout' in request.POST:
             if not cart.items.exists():
@@ -195,7 +306,14 @@ def cart_view(request):
 
         return redirect('cart')
 
-    context = {'cart': cart}
+    # La plantilla solo recibe datos ya calculados. Presupuesto de la página (lo
+    # fija CartSummaryTests): sesión, usuario, carrito, items y sugerencias, sin
+    # importar cuántos items haya; con el carrito vacío no se piden sugerencias.
+    summary = build_cart_summary(cart)
+    context = {
+        'cart': summary,
+        'related_products': related_to_cart(summary.product_ids),
+    }
     return render(request, 'core/cart.html', context)
 
 # --- VISTA NUEVA: Para la página de confirmación de compra ---
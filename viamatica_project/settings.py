@@ -61,13 +61,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Plantillas compiladas una sola vez por proceso, también con
+            # DEBUG=True (el autoreload de runserver limpia la caché al editarlas).
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -82,6 +89,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # BEGIN IMMEDIATE: los checkouts concurrentes esperan el lock de
+            # escritura en vez de fallar con "database is locked".
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -137,4 +150,22 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
-}
\ No newline at end of file
+    # Proxies de confianza delante de Django. Con 0 los throttles identifican al
+    # cliente por REMOTE_ADDR e ignoran X-Forwarded-For, que el cliente puede
+    # falsificar; detrás de un balanceador hay que poner cuántos hay.
+    'NUM_PROXIES': 0,
+}
+
+# Minutos que una reserva de stock de un carrito activo permanece vigente.
+CART_RESERVATION_MINUTES = 15
+
+# Número de productos "comprados juntos" que se precalculan por producto.
+RECOMMENDATIONS_TOP_K = 10
+
+# Token buckets en memoria por scope (ver core/throttling.py): `burst` es la
+# capacidad del bucket y `rate` la velocidad de recarga.
+THROTTLE_BUCKETS = {
+    'checkout': {'burst': 5, 'rate': '10/min'},
+    'token': {'burst': 10, 'rate': '5/min'},
+    'register': {'burst': 3, 'rate': '10/hour'},
+}